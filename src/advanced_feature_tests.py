@@ -7,15 +7,24 @@ Examples of using BedrockConnectHelper to call Bedrock APIs:
 - InvokeModel
 - InvokeModelWithResponseStream
 
-Each section of the run_test function can be extracted to request a Bedrock API separately. 
+Each run_*_test function can be extracted to request a Bedrock API separately. 
 
 The script usage:
-usage: advanced_feature_tests.py [-h] api_name={converse,converse_stream,invoke_model,invoke_model_with_response_stream} debug_mode={1,0}
+usage: advanced_feature_tests.py [-h] api_name={converse,converse_stream,invoke_model,invoke_model_with_response_stream,all,invoke_model_batch_check} debug_mode={1,0}
 example:
 python advanced_feature_tests.py converse 0
+
+Use "all" as the api_name to run the tests of all APIs concurrently.
+Use "invoke_model_batch_check" to check concurrent InvokeModel requests of a single instance against a stubbed API, without calling Bedrock.
 """
 import argparse
-from bedrock_connect_helper import *
+import asyncio
+import json
+import logging
+import sys
+import time
+from types import MappingProxyType
+from bedrock_connect_helper import BedrockConnectHelper
 
 # Set the file path to the Bedrock endpoint configuration file
 filename = 'bedrock_connect_helper/bedrock_endpoints.conf'
@@ -23,13 +32,38 @@ filename = 'bedrock_connect_helper/bedrock_endpoints.conf'
 # Bedrock model ID
 model_id = "anthropic.claude-3-haiku-20240307-v1:0"
 
-def run_test(api_name, debug_mode):
+# Inference configurations of the Converse API tests
+INFERENCE_CONFIG = MappingProxyType({
+    'maxTokens': 2000,
+    'temperature': 0.5,
+    'stopSequences': ('</result>',) # A tuple constant, which botocore accepts as a list
+})
+
+# Prompts of the Converse API tests
+SYSTEM_PROMPT = []
+
+PROMPT = [
+    {
+        "role": "user",
+        "content": [
+            {
+                "text": "Say Hello"
+            }
+        ]
+    }
+]
+
+# The pre-serialized InvokeModel request body. "%s" is replaced with the user text as a JSON string.
+# The body is bytes, which BedrockConnectHelper passes to botocore as is, without encoding it again.
+INVOKE_MODEL_BODY_TEMPLATE = b'{"messages":[{"role":"user","content":[{"type":"text","text":%s}]}],"system":"","max_tokens":256,"anthropic_version":"bedrock-2023-05-31"}'
+
+# Print each streaming response at once instead of delta by delta. It is set when the tests of all APIs run concurrently.
+buffer_stream_output = False
+
+async def run_test(api_name, debug_mode):
     """Run test for sending requests to LLM API using BedrockConnectHelp"""
 
-    # Tip: Change the value to run tests on different APIs
-    valid_test_modes = ['converse', 'converse_stream', 'invoke_model', 'invoke_model_with_response_stream']
-    
-    if api_name in valid_test_modes:
+    if api_name in VALID_API_NAMES:
         test_mode = api_name
     else:
         print("Invalid API name!\n")
@@ -40,118 +74,97 @@ def run_test(api_name, debug_mode):
     else:
         debug_mode = False
 
-    # Get BedrockConnectHelper instance
-    bedrock_helper = BedrockConnectHelper(model_id=model_id, auto_load_config=True, auto_update_config=False, config_file_path=filename,
-                                            debug_mode=debug_mode, api_read_timeout=1, api_connect_timeout=1)
+    # Get BedrockConnectHelper instance. The endpoint configuration file is loaded off the event loop.
+    # Each test uses its own instance, as an instance keeps the state of its latest request. The instances share
+    # the parsed endpoint configuration file and the regional clients, which BedrockConnectHelper caches.
+    async with BedrockConnectHelper.client_factory(model_id=model_id, auto_load_config=True, auto_update_config=False, config_file_path=filename,
+                                debug_mode=debug_mode, api_read_timeout=1, api_connect_timeout=1) as bedrock_helper:
+        # The inference configs are fixed for all tests. Only Converse APIs use them.
+        bedrock_helper.set_inference_config(INFERENCE_CONFIG)
 
-    # Enable Amazon Bedrock Cross-region inference feature. Please note till 2024-09-14, it only supports some of Anthropic's Claude models.
-    # bedrock_helper.set_cross_region_inference(True)
+        await run_api_test(bedrock_helper, test_mode)
 
-    # Test Bedrock Converse API
-    if test_mode == 'converse':
-        # Set inference configs
-        inference_configs = {
-                'maxTokens': 2000,
-                'temperature': 0.5,
-                'stopSequences': [
-                    '</result>',
-                ]
-            }
 
-        bedrock_helper.set_inference_config(inference_configs)
+async def run_converse_test(bedrock_helper):
+    """Test Bedrock Converse API"""
+    # Send the Request
+    response = await bedrock_helper.bedrock_converse_with_retry_async(PROMPT, SYSTEM_PROMPT, extract_content=True) # Converse API
+    print("# BEDROCK Converse API:\n", response, "\n")
 
-        # Construct a Bedrock InvokeModel API request
-        system_prompt = []
 
-        prompt = [
-            {
-                "role": "user",
-                "content": [
-                    {
-                        "text": "Say Hello"
-                    }
-                ]
-            }
-        ]
+async def run_converse_stream_test(bedrock_helper):
+    """Test Bedrock ConverseStream API"""
+    # Send the Request
+    response = await bedrock_helper.converse_stream_async(messages=PROMPT, system=SYSTEM_PROMPT) # ConverseStream API
+    print("# BEDROCK Converse API:\n", response, "\n")
 
-        # Send the Request
-        response = bedrock_helper.bedrock_converse_with_retry(prompt, system_prompt, extract_content=True) # Converse API
-        print("# BEDROCK Converse API:\n", response, "\n")
-
-    elif test_mode == 'converse_stream':
-        # Set inference configs
-        inference_configs = {
-                'maxTokens': 2000,
-                'temperature': 0.5,
-                'stopSequences': [
-                    '</result>',
-                ]
-            }
+    if response:
+        await print_response_stream(bedrock_helper)
 
-        bedrock_helper.set_inference_config(inference_configs)
 
-        # Construct a Bedrock InvokeModel API request
-        system_prompt = []
+async def run_invoke_model_test(bedrock_helper):
+    """Test Bedrock InvokeModel API"""
+    # Only the user text is serialized per request
+    request_body = INVOKE_MODEL_BODY_TEMPLATE % json.dumps("Say Hello").encode()
 
-        prompt = [
-            {
-                "role": "user",
-                "content": [
-                    {
-                        "text": "Say Hello"
-                    }
-                ]
-            }
-        ]
+    response = await bedrock_helper.invoke_model_async(body=request_body) # InvokeModel API
+    print("# BEDROCK InvokeModel API:\n", response, "\n")
+    
+    if response:
+        print("## CONTENT:\n", bedrock_helper.extract_response(), "\n")
+
+
+async def run_invoke_model_with_response_stream_test(bedrock_helper):
+    """Test Bedrock InvokeModelWithResponseStream API"""
+    # Only the user text is serialized per request
+    request_body = INVOKE_MODEL_BODY_TEMPLATE % json.dumps("Say Hello").encode()
+
+    response = await bedrock_helper.invoke_model_with_response_stream_async(body=request_body) # InvokeModelWithResponseStream API
+    print("# BEDROCK InvokeModelWithResponseStream API:\n", response)
 
-        # Send the Request
-        response = bedrock_helper.converse_stream(messages=prompt, system=system_prompt) # ConverseStream API
-        print("# BEDROCK Converse API:\n", response, "\n")
+    if response:
+        await print_response_stream(bedrock_helper)
 
-        if response:
-            stream = bedrock_helper.extract_response()
 
-            streaming_data = bedrock_helper.retrieve_response_stream()
-            print("##STREAM DATA:\n", streaming_data)
+async def print_response_stream(bedrock_helper):
+    """Print each delta of the streaming response as soon as it arrives, instead of waiting for the whole response"""
+    stream = bedrock_helper.extract_response()
 
-    elif test_mode == 'invoke_model':
-        import json
+    if buffer_stream_output:
+        # The streams of concurrent tests would mix, so print the whole stream at once with the API name
+        deltas = [delta async for delta in bedrock_helper.aiter_stream()]
+        print(f"##STREAM DATA ({bedrock_helper.api_method}):", ''.join(deltas))
 
-        message = [{"role":"user", "content": [{"type": "text", "text": "Say Hello"}]}]
+        return
 
-        request_body = {
-            "messages": message,
-            "system": "",
-            "max_tokens": 256,
-            "anthropic_version": "bedrock-2023-05-31"
-        }
+    print("##STREAM DATA:", flush=True) # Flush the text layer before writing to its underlying binary buffer
 
-        response = bedrock_helper.invoke_model(body=json.dumps(request_body)) # InvokeModel API
-        print("# BEDROCK InvokeModel API:\n", response, "\n")
-        
-        if response:
-            print("## CONTENT:\n", bedrock_helper.extract_response(), "\n")
+    # Write the encoded deltas to the binary buffer, bypassing the text layer, and flush each one so it shows on arrival
+    async for delta in bedrock_helper.aiter_stream():
+        sys.stdout.buffer.write(delta.encode())
+        sys.stdout.buffer.flush()
 
-    elif test_mode == 'invoke_model_with_response_stream':
-        import json
+    print()
 
-        message = [{"role":"user", "content": [{"type": "text", "text": "Say Hello"}]}]
 
-        request_body = {
-            "messages": message,
-            "system": "",
-            "max_tokens": 256,
-            "anthropic_version": "bedrock-2023-05-31"
-        }
+# Tip: Change the value to run tests on different APIs
+API_TEST_HANDLERS = {
+    'converse': run_converse_test,
+    'converse_stream': run_converse_stream_test,
+    'invoke_model': run_invoke_model_test,
+    'invoke_model_with_response_stream': run_invoke_model_with_response_stream_test,
+}
 
-        response = bedrock_helper.invoke_model_with_response_stream(body=json.dumps(request_body)) # InvokeModelWithResponseStream API
-        print("# BEDROCK InvokeModelWithResponseStream API:\n", response)
+VALID_API_NAMES = frozenset(API_TEST_HANDLERS)
 
-        if response:
-            stream = bedrock_helper.extract_response()
 
-            streaming_data = bedrock_helper.retrieve_response_stream()
-            print("##STREAM DATA:\n", streaming_data)
+async def run_api_test(bedrock_helper, test_mode):
+    """Send requests to the given API with a BedrockConnectHelper instance"""
+
+    # Enable Amazon Bedrock Cross-region inference feature. Please note till 2024-09-14, it only supports some of Anthropic's Claude models.
+    # bedrock_helper.set_cross_region_inference(True)
+
+    await API_TEST_HANDLERS[test_mode](bedrock_helper)
 
     # Manually update Bedrock Endpoint Configuration File
     print('# FAILED REGIONS:', bedrock_helper.failed_regions)
@@ -159,16 +172,72 @@ def run_test(api_name, debug_mode):
 
     if new_config is not None:
         # Write the updated region configurations back to the bedrock_endpoints.conf
-        conf_save_result = bedrock_helper.write_json_to_file_with_lock(new_config)
+        conf_save_result = await asyncio.to_thread(bedrock_helper.write_json_to_file_with_lock, new_config)
+
+
+class _StubInvokeModelBody:
+    """A stubbed InvokeModel response body, which echoes the user text of its request"""
+
+    def __init__(self, request_body):
+        self.text = json.loads(request_body)['messages'][0]['content'][0]['text']
+
+    def read(self):
+        time.sleep(0.05) # Slow reads let the concurrent requests interleave
+        return json.dumps({'content': [{'type': 'text', 'text': self.text}]}).encode()
+
+
+def _stub_invoke_model(region_name, llm_api_kwargs, model_id):
+    """Return a stubbed InvokeModel response instead of sending the request to the region"""
+    return {'body': _StubInvokeModelBody(llm_api_kwargs['body'])}
+
+
+async def run_invoke_model_batch_check(debug_mode):
+    """Check that concurrent InvokeModel requests of a single instance each extract the content of their own response"""
+    async with BedrockConnectHelper.client_factory(model_id=model_id, auto_load_config=True, auto_update_config=False, config_file_path=filename,
+                                debug_mode=debug_mode > 0) as bedrock_helper:
+        bedrock_helper.set_api_method('invoke_model')
+
+        # Stub the regional API call of this instance only, so no request is sent to Bedrock
+        bedrock_helper._call_region = _stub_invoke_model
+
+        texts = [f"Request {i}" for i in range(8)]
+        request_bodies = [INVOKE_MODEL_BODY_TEMPLATE % json.dumps(text).encode() for text in texts]
+
+        responses = await bedrock_helper.bedrock_converse_batch_async(request_bodies, extract_content=True)
+
+    print("# BEDROCK InvokeModel batch (stubbed):\n", responses, "\n")
+
+    if responses != texts:
+        raise RuntimeError("The concurrent InvokeModel requests got the content of other responses!")
+
+    print("## Each request got the content of its own response\n")
+
+
+async def run_all_tests(debug_mode):
+    """Run tests of all APIs concurrently"""
+    global buffer_stream_output
+    buffer_stream_output = True
+
+    await asyncio.gather(*(run_test(api_name, debug_mode) for api_name in VALID_API_NAMES))
 
 
 def main():
     parser = argparse.ArgumentParser(description='Main script')
-    parser.add_argument('api_name', choices=['converse', 'converse_stream', 'invoke_model', 'invoke_model_with_response_stream'])
+    parser.add_argument('api_name', choices=sorted(VALID_API_NAMES) + ['all', 'invoke_model_batch_check'])
     parser.add_argument('debug_mode', choices=['1', '0'])
     args = parser.parse_args()
 
-    run_test(args.api_name, int(args.debug_mode))
+    if int(args.debug_mode):
+        # Show the debug messages of BedrockConnectHelper only, without the ones of boto3 and botocore
+        logging.basicConfig(format='%(message)s')
+        logging.getLogger('bedrock_connect_helper').setLevel(logging.DEBUG)
+
+    if args.api_name == 'all':
+        asyncio.run(run_all_tests(int(args.debug_mode)))
+    elif args.api_name == 'invoke_model_batch_check':
+        asyncio.run(run_invoke_model_batch_check(int(args.debug_mode)))
+    else:
+        asyncio.run(run_test(args.api_name, int(args.debug_mode)))
 
 if __name__ == "__main__":
     main()
@@ -1,2 +1,7 @@
+import logging
+
 from .bedrock_connect_helper import * # Import the BedrockConnectHelper class
-from .bedrock_connect_util import * # Import the BedrockConnectUtil classes
\ No newline at end of file
+from .bedrock_connect_util import * # Import the BedrockConnectUtil classes
+
+# Do not print the messages of the package to stderr, unless the application configures logging
+logging.getLogger(__name__).addHandler(logging.NullHandler())
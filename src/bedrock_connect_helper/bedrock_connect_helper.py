@@ -3,6 +3,8 @@ A helper class example for implementing Cross-Region Resilience Solution
 This example class implements the Amazon Bedrock Cross-Region Resilience Solution using the AWS Python SDK (boto3).
 
 Key configurations:
+    They are class attributes, which apply to all instances. Assign an attribute of an instance, e.g. helper.MAX_RETRY_TIME = 3,
+    to change it for the instance only.
     MAX_RETRY_TIME (int) -- The maximum number of retry attempts for Bedrock APIs. Recommended values are 3-5.
     MULTI_REGION_RETRY (bool) -- Retry Bedrock APIs in multiple regions if APIs are temporarily unable to respond correctly.
     MAX_RETRY_TIMES_FOR_EACH_REGION (int) -- The maximum number of retry attempts for each region before trying a different region.
@@ -10,18 +12,313 @@ Key configurations:
     PRIMARY_REGION_RANDOM_DISTRIBUTION (bool) -- Randomly select one of primary regions for the initial API request and prioritize 
         primary regions over other regions when it is set to True.
     NEXT_RETRY_TIME_WINDOW (int) -- The time window (in seconds) added to the current time to set the next available time for failed endpoints.
+        The following requests of the same instance also skip failed endpoints until their next available time.
     ENABLE_CROSS_REGION_INFERENCE (bool) - Whether use Amazon Bedrock cross-region inferece feature
+        by default. Change it for an instance with set_cross_region_inference().
+    HEDGE_FANOUT (int) -- The number of regions a request is sent to concurrently by default. 1 disables hedged requests.
+        Change it for an instance with set_hedge_fanout().
+    HEDGE_DELAY (float) -- The delay (in seconds) before sending a hedged request to the next region, when no earlier request
+        has completed. 0 sends the requests to all HEDGE_FANOUT regions at once.
+    LATENCY_BASED_ROUTING (bool) -- Order available endpoints by their smoothed request latency, instead of selecting
+        a primary region randomly. Primary regions are still prioritized when PRIMARY_REGION_RANDOM_DISTRIBUTION is True.
+    LATENCY_EWMA_WEIGHT (float) -- The weight of the latest request latency in the smoothed latency of an endpoint.
+    PREWARM_CLIENTS (bool) -- Create the Bedrock runtime clients of the available regions when the endpoint configuration
+        is loaded, so the first request to each region does not create its client. The client of the first region is created
+        at once, and the others in the background.
+    BASE_BACKOFF (float) -- The base delay (in seconds) of the exponential backoff with full jitter before retrying
+        a throttled or unavailable region. Requests to the next region are sent without delay.
+    MAX_BACKOFF (float) -- The maximum backoff delay (in seconds).
+    ENDPOINT_URL_TEMPLATE (string) -- The Bedrock runtime endpoint URL with a "{region}" placeholder, e.g.
+        "https://bedrock-runtime.{region}.amazonaws.com", so that clients use it without resolving the endpoint.
+        None resolves the endpoint of each region with botocore.
 """
 import json
+import sys
 import time
 import os
-import fcntl
 import random
-import boto3
-import botocore
+import math
+import asyncio
+import contextlib
+import threading
+import queue
+import atexit
+import logging
+import collections
+import operator
+import warnings
+import concurrent.futures
+import botocore.config
+import botocore.exceptions
 
 from .bedrock_connect_util import * # Import the BedrockConnectUtil classes
 
+# Use orjson to parse and serialize JSON when it is installed
+try:
+    import orjson
+
+    _json_loads = orjson.loads
+
+    def _json_dumps(data):
+        """Serialize the data to compact JSON bytes"""
+        return orjson.dumps(data)
+
+except ImportError:
+    _json_loads = json.loads
+
+    def _json_dumps(data):
+        """Serialize the data to compact JSON bytes"""
+        return json.dumps(data, separators=(',', ':')).encode()
+
+_logger = logging.getLogger(__name__)
+
+# The maximum number of error messages kept by each instance
+_ERROR_LOGS_MAXLEN = 256
+
+def _no_debug(*args, **kwargs):
+    """The debug output function when the debug mode is off"""
+    pass
+
+# Bedrock runtime APIs grouped by their request formats
+_CONVERSE_APIS = frozenset({'converse', 'converse_stream'})
+_INVOKE_APIS = frozenset({'invoke_model', 'invoke_model_with_response_stream'})
+
+# Optional parameters of the APIs, which are instance attributes with the same names
+_CONVERSE_OPTIONAL_PARAMS = ('inferenceConfig', 'toolConfig', 'guardrailConfig', 'additionalModelRequestFields', 'additionalModelResponseFieldPaths')
+_INVOKE_OPTIONAL_PARAMS = ('contentType', 'accept', 'trace', 'guardrailIdentifier', 'guardrailVersion')
+
+# Get the values of all optional parameters of the APIs from an instance at once
+_get_converse_optional_params = operator.attrgetter(*_CONVERSE_OPTIONAL_PARAMS)
+_get_invoke_optional_params = operator.attrgetter(*_INVOKE_OPTIONAL_PARAMS)
+
+# Optional parameters of InvokeModel APIs and their values when they are not given: ((parameter name, default value), ...)
+_INVOKE_KWARG_DEFAULTS = (
+    ('contentType', 'application/json'),
+    ('accept', 'application/json'),
+    ('guardrailIdentifier', None),
+    ('guardrailVersion', None),
+)
+
+# Parsed endpoint configuration files: {file path: ((modification time, file size), region configurations)}
+_CONF_CACHE = {}
+_CONF_CACHE_LOCK = threading.Lock()
+
+# Regional Bedrock runtime clients shared by all instances: {(region, *botocore config key, endpoint URL template, boto3 default session): (client, {API method name: bound method})}
+_CLIENT_CACHE = {}
+_CLIENT_CACHE_LOCK = threading.Lock()
+_BOTOCORE_SESSION = None # Created with the first client when boto3's default session is not set up, and only used while holding _CLIENT_CACHE_LOCK
+
+def _get_boto3_default_session():
+    """Get boto3's default session when boto3 is imported and the session is set up, e.g. by boto3.setup_default_session() or boto3.client()"""
+    boto3 = sys.modules.get('boto3')
+
+    return boto3.DEFAULT_SESSION if boto3 is not None else None
+
+# botocore configs shared by all instances: {(read timeout, connect timeout, TCP keep-alive, max pool connections): config}
+_BOTOCORE_CONFIG_CACHE = {}
+
+# The minimum HTTP connection pool size of each client, which is raised for long endpoint lists
+_MIN_POOL_CONNECTIONS = 64
+
+def _get_botocore_config(read_timeout, connect_timeout, tcp_keepalive=True, max_pool_connections=_MIN_POOL_CONNECTIONS):
+    """
+    Get the botocore config for the given timeouts and connection settings
+
+    botocore sends each request once (the class handles retries), and the adaptive mode's client-side
+    rate limiter slows down requests to a throttled endpoint.
+    """
+    config_key = (read_timeout, connect_timeout, tcp_keepalive, max_pool_connections)
+    config = _BOTOCORE_CONFIG_CACHE.get(config_key)
+
+    if config is None:
+        config = botocore.config.Config(
+            read_timeout=read_timeout,
+            connect_timeout=connect_timeout,
+            retries={"mode": "adaptive", "total_max_attempts": 1}, # Including the initial attempt
+            tcp_keepalive=tcp_keepalive,
+            max_pool_connections=max_pool_connections
+        )
+        config = _BOTOCORE_CONFIG_CACHE.setdefault(config_key, config)
+
+    return config
+
+def _write_json_file(file_path, data):
+    """
+    Overwrite a JSON file atomically
+
+    The JSON data is written to a temporary file in the same directory, which then replaces the file.
+    Readers always see either the previous or the new file, never a partially written one. Raise OSError on failure.
+    """
+    # Convert the Python dictionary to compact JSON bytes to reduce the bytes written and synced to disk
+    json_data = _json_dumps(data)
+
+    # A temporary file for each writer thread
+    tmp_file_path = f"{file_path}.tmp.{os.getpid()}.{threading.get_ident()}"
+
+    try:
+        with open(tmp_file_path, 'wb') as f:
+            f.write(json_data)
+            f.flush()
+            os.fsync(f.fileno())
+
+        os.replace(tmp_file_path, file_path)
+
+    except OSError:
+        if os.path.exists(tmp_file_path):
+            os.remove(tmp_file_path)
+
+        raise
+
+# Endpoint configuration updates of closed instances, which are written by one background thread: (file path, region configurations)
+_FLUSH_QUEUE = queue.Queue(maxsize=1024)
+_FLUSH_WINDOW = 0.5 # Seconds to wait for more updates of the same files before writing them
+_FLUSH_EXIT_TIMEOUT = 10 # Seconds to wait for the queued updates when the interpreter exits
+_FLUSH_THREAD = None
+_FLUSH_THREAD_LOCK = threading.Lock()
+
+def _merge_region_configs(merged_configs, region_configs):
+    """
+    Merge the region configurations of an update into {region: configuration}
+
+    The latest next available time of each region is kept, so no instance's failed regions are lost.
+    """
+    for regional_conf in region_configs:
+        merged_conf = merged_configs.get(regional_conf['region'])
+
+        if merged_conf is None:
+            merged_configs[regional_conf['region']] = dict(regional_conf)
+        else:
+            next_available_time = max(merged_conf['next_available_time'], regional_conf['next_available_time'])
+            merged_conf.update(regional_conf)
+            merged_conf['next_available_time'] = next_available_time
+
+    return merged_configs
+
+def _flush_worker():
+    """Coalesce the configuration updates which arrive within the flush window, and write each file once"""
+    while True:
+        updates = [_FLUSH_QUEUE.get()]
+        deadline = time.monotonic() + _FLUSH_WINDOW
+
+        while True:
+            timeout = deadline - time.monotonic()
+
+            if timeout <= 0:
+                break
+
+            try:
+                updates.append(_FLUSH_QUEUE.get(timeout=timeout))
+            except queue.Empty:
+                break
+
+        try:
+            pending_updates = {}
+
+            for file_path, region_configs in updates:
+                _merge_region_configs(pending_updates.setdefault(file_path, {}), region_configs)
+
+            for file_path, merged_configs in pending_updates.items():
+                _write_json_file(file_path, list(merged_configs.values()))
+
+        except Exception as e:
+            _logger.warning("Error writing to file: %s", e)
+
+        finally:
+            for _ in updates:
+                _FLUSH_QUEUE.task_done()
+
+def _submit_config_update(file_path, region_configs):
+    """Queue an endpoint configuration update for the background writer, which is started on first use"""
+    global _FLUSH_THREAD
+
+    if _FLUSH_THREAD is None:
+        with _FLUSH_THREAD_LOCK:
+            if _FLUSH_THREAD is None:
+                _FLUSH_THREAD = threading.Thread(target=_flush_worker, name='bedrock-connect-helper-flush', daemon=True)
+                _FLUSH_THREAD.start()
+
+    _FLUSH_QUEUE.put((file_path, [dict(regional_conf) for regional_conf in region_configs]))
+
+def _wait_for_config_updates(timeout=None):
+    """
+    Wait until the queued endpoint configuration updates are written, or the timeout (in seconds) expires
+
+    Returns:
+        Bool: True when all queued updates are written.
+    """
+    deadline = None if timeout is None else time.monotonic() + timeout
+
+    with _FLUSH_QUEUE.all_tasks_done:
+        while _FLUSH_QUEUE.unfinished_tasks:
+            if deadline is None:
+                _FLUSH_QUEUE.all_tasks_done.wait()
+            else:
+                remaining = deadline - time.monotonic()
+
+                if remaining <= 0:
+                    return False
+
+                _FLUSH_QUEUE.all_tasks_done.wait(remaining)
+
+    return True
+
+def _flush_at_exit():
+    """Write the queued updates before the interpreter exits, as the daemon thread is stopped then"""
+    if not _wait_for_config_updates(_FLUSH_EXIT_TIMEOUT):
+        _logger.warning("Endpoint configuration updates were not written within %s seconds", _FLUSH_EXIT_TIMEOUT)
+
+atexit.register(_flush_at_exit)
+
+def _reset_flush_after_fork():
+    """
+    Reset the background writer in a forked child process
+
+    The child does not inherit the writer thread, so it starts its own on first use. The updates queued by the parent
+    are left to the parent, which still writes them.
+    """
+    global _FLUSH_QUEUE, _FLUSH_THREAD, _FLUSH_THREAD_LOCK
+
+    _FLUSH_QUEUE = queue.Queue(maxsize=1024)
+    _FLUSH_THREAD = None
+    _FLUSH_THREAD_LOCK = threading.Lock()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_flush_after_fork)
+
+# The thread pool that sends hedged requests and pre-warms clients, shared by all instances to avoid starting threads for each request
+_EXECUTOR = None
+_EXECUTOR_LOCK = threading.Lock()
+
+def _get_executor():
+    """Get the shared thread pool, which is created on first use"""
+    global _EXECUTOR
+
+    if _EXECUTOR is None:
+        with _EXECUTOR_LOCK:
+            if _EXECUTOR is None:
+                _EXECUTOR = concurrent.futures.ThreadPoolExecutor(thread_name_prefix='bedrock-connect-helper')
+
+    return _EXECUTOR
+
+def _reset_clients_after_fork():
+    """
+    Reset the shared thread pool, clients and locks in a forked child process
+
+    The child does not inherit the threads of the pool, and a lock held by another thread at the fork is never released
+    in the child. The clients are created again, so the child does not share their HTTP connections with the parent.
+    """
+    global _EXECUTOR, _EXECUTOR_LOCK, _CLIENT_CACHE, _CLIENT_CACHE_LOCK, _BOTOCORE_SESSION, _CONF_CACHE_LOCK
+
+    _EXECUTOR = None
+    _EXECUTOR_LOCK = threading.Lock()
+    _CLIENT_CACHE = {}
+    _CLIENT_CACHE_LOCK = threading.Lock()
+    _BOTOCORE_SESSION = None
+    _CONF_CACHE_LOCK = threading.Lock()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_clients_after_fork)
+
 class BedrockConnectHelper:
 
     # Global configurations
@@ -31,24 +328,42 @@ class BedrockConnectHelper:
     MAX_RETRY_TIMES_FOR_EACH_REGION = 1
     PRIMARY_REGION_RANDOM_DISTRIBUTION = True
     ENABLE_CROSS_REGION_INFERENCE = False
-
-    VALID_BEDROCK_APIS = ['converse', 'converse_stream', 'invoke_model', 'invoke_model_with_response_stream']
-
-    # Shared attributes
-    debug_mode = False
-    api_method = 'converse'
-    data_type = 'text'
-    read_timeout = 5
-    connect_timeout = 5
-
-    # Bedrock API parameters
-    accept = 'application/json'
-    contentType = 'application/json'
-
-    error_logs = []
+    HEDGE_FANOUT = 1
+    HEDGE_DELAY = 0
+    LATENCY_BASED_ROUTING = False
+    LATENCY_EWMA_WEIGHT = 0.2
+    PREWARM_CLIENTS = True
+    BASE_BACKOFF = 0.05
+    MAX_BACKOFF = 10.0
+    ENDPOINT_URL_TEMPLATE = None
+
+    # Error codes of throttled or temporarily unavailable regions, which are retried after a backoff delay
+    BACKOFF_ERROR_CODES = frozenset({'ThrottlingException', 'TooManyRequestsException', 'ServiceUnavailableException'})
+
+    # Error codes of invalid credentials, which fail in every region, so the request is not retried
+    FATAL_ERROR_CODES = frozenset({'UnrecognizedClientException'})
+
+    # Error codes which depend on the region, e.g. the model access or the model ID of the region, rather than on its availability.
+    # The request is retried in the next region, but the region is not added to the failed regions.
+    REGION_ERROR_CODES = frozenset({'ValidationException', 'AccessDeniedException', 'ResourceNotFoundException'})
+
+    VALID_BEDROCK_APIS = _CONVERSE_APIS | _INVOKE_APIS
+
+    # Every instance attribute is declared here. The __dict__ slot only keeps the key configurations changed for an instance,
+    # e.g. by set_cross_region_inference(), which override the class attributes.
+    __slots__ = (
+        'current_time', 'model_id', 'config_file_path', 'debug_mode', '_log', 'error_logs', 'auto_update_config', '_closed',
+        'raw_region_configs', '_region_index', 'validate_regions', 'failed_regions', '_breaker',
+        'inference_profile_ids', 'latency_updated',
+        'api_method', 'data_type', 'response', '_response_body', 'stream_data', 'bedrock_utilities',
+        'inferenceConfig', 'toolConfig', 'guardrailConfig', 'additionalModelRequestFields', 'additionalModelResponseFieldPaths',
+        'contentType', 'accept', 'trace', 'guardrailIdentifier', 'guardrailVersion',
+        'read_timeout', 'connect_timeout', 'tcp_keepalive', 'max_pool_connections', 'config',
+        '__dict__', '__weakref__',
+    )
 
     def __init__(self, model_id='', auto_load_config=True, auto_update_config=False, config_file_path='',
-            debug_mode=False, api_read_timeout=5, api_connect_timeout=5):
+            debug_mode=False, api_read_timeout=5, api_connect_timeout=5, api_tcp_keepalive=True, api_max_pool_connections=None):
         """
         Initialize an instance of the class
         
@@ -58,31 +373,46 @@ class BedrockConnectHelper:
         Args:
             model_id (string) --  One of Amazon Bedrock model ids for inference.
             auto_load_config (bool) -- Allow the instance initialization to automatically load the endpoint configuration file or not.
-            auto_update_config(bool) -- Allow the class destructor to automatically retrieve failed endpoints and update configuration file.
+            auto_update_config(bool) -- Allow close() to automatically retrieve failed endpoints and update configuration file.
             config_file_path (string) -- Set a customized configuation file path.
-            debug_mode (bool) -- Allow the debug() method to print out logs. 
+            debug_mode (bool) -- Allow the debug() method to log debug messages to the "bedrock_connect_helper" logger.
             api_read_timeout (int) -- Set botocore.config.Config: read_timeout.
             api_connect_timeout (int) -- Set botocore.config.Config: connect_timeout.
+            api_tcp_keepalive (bool) -- Set botocore.config.Config: tcp_keepalive.
+            api_max_pool_connections (int) -- Set botocore.config.Config: max_pool_connections.
+                By default, it is the larger of 64 and 4 connections per endpoint in the configuration file.
         """
         # Calculate the current time for checking API endpoints' availability
-        self.current_time = round(time.time())
+        self.current_time = int(time.time())
 
         if model_id:
             self.model_id = model_id
         else:
             self.model_id = ''
 
-        if config_file_path:
-            self.config_file_path = config_file_path
+        self.config_file_path = config_file_path
 
-        if debug_mode:
-            self.debug_mode = debug_mode
+        self.set_debug_mode(debug_mode)
+        self.error_logs = collections.deque(maxlen=_ERROR_LOGS_MAXLEN) # The latest error messages of the instance
 
         self.auto_update_config = auto_update_config
+        self._closed = False
 
         self.raw_region_configs = []
+        self._region_index = {} # {region: regional configuration in raw_region_configs}
+        self.validate_regions = []
         self.failed_regions = []
+        # The in-memory circuit breaker of failed regions: {region: (monotonic deadline, next available timestamp)}
+        # Requests compare the monotonic deadline, so clock changes do not affect it. The timestamp is written to the configuration file.
+        self._breaker = {}
+        self.inference_profile_ids = {}
+        self.latency_updated = False
+
+        self.api_method = 'converse'
+        self.data_type = 'text'
         self.response = {}
+        self._response_body = None # (InvokeModel API response, its decoded body)
+        self.stream_data = None
         self.bedrock_utilities = {}
 
         # Optional API parameters
@@ -91,27 +421,64 @@ class BedrockConnectHelper:
         self.guardrailConfig = {}
         self.additionalModelRequestFields = None
         self.additionalModelResponseFieldPaths = []
-
-        # Set customized config to botocore
-        self.config = botocore.config.Config(
-            read_timeout=api_read_timeout,
-            connect_timeout=api_connect_timeout,
-            retries={"max_attempts": 0}
-        )
+        self.contentType = 'application/json'
+        self.accept = 'application/json'
+        self.trace = 'DISABLED'
+        self.guardrailIdentifier = None
+        self.guardrailVersion = None
 
         # Load API endpoint automatically - endpoints are limited to each model instance
         if auto_load_config:
-            self.debug(f"CONFIG_FILE_PATH: {config_file_path}")
+            self._log("CONFIG_FILE_PATH: %s", config_file_path)
             self.load_conf_file()
 
             ## Retrieve currently validate regions from the bedrock_endpoints.conf
             self.validate_regions = self.get_validate_regions_from_conf(self.raw_region_configs)
 
+        # Set customized config to botocore. Size the connection pool for concurrent requests to all endpoints.
+        if not api_max_pool_connections:
+            api_max_pool_connections = max(_MIN_POOL_CONNECTIONS, 4 * len(self.raw_region_configs))
+
+        self.read_timeout = api_read_timeout
+        self.connect_timeout = api_connect_timeout
+        self.tcp_keepalive = api_tcp_keepalive
+        self.max_pool_connections = api_max_pool_connections
+        self.config = _get_botocore_config(api_read_timeout, api_connect_timeout, api_tcp_keepalive, api_max_pool_connections)
+
+        if auto_load_config and self.PREWARM_CLIENTS:
+            self.prewarm_clients()
+
+
+    @classmethod
+    @contextlib.asynccontextmanager
+    async def client_factory(cls, **kwargs):
+        """
+        Create an instance of the class for use in asyncio code
+
+        The instance is initialized in a worker thread, so loading the endpoint configuration file
+        does not block the event loop.
+
+        Usage:
+            async with BedrockConnectHelper.client_factory(model_id=model_id, config_file_path=filename) as bedrock_helper:
+                response = await bedrock_helper.converse_async(messages=prompt)
+
+        Args:
+            **kwargs (dict) -- The same arguments as the class constructor.
+        """
+        bedrock_helper = await asyncio.to_thread(cls, **kwargs)
+
+        try:
+            yield bedrock_helper
+        finally:
+            await asyncio.to_thread(bedrock_helper.close)
+
 
     def load_conf_file(self, file_path=''):
         """
         Load the Bedrock Endpoint Configuration File
 
+        The parsed file is cached until the file's modification time or size changes.
+
         Args:
             file_path (string) -- Overwrite the default file path to the configuration file
         """
@@ -121,24 +488,62 @@ class BedrockConnectHelper:
         filename = self.config_file_path
 
         try:
-            with open(filename) as f:
-                endpoint_config = f.read()
+            # Skip reading and parsing the file when it has not changed since it was last loaded
+            file_stat = os.stat(filename)
+            file_version = (file_stat.st_mtime_ns, file_stat.st_size)
 
-            self.raw_region_configs = json.loads(endpoint_config)
+            with _CONF_CACHE_LOCK:
+                cached_conf = _CONF_CACHE.get(filename)
+
+            if cached_conf is not None and cached_conf[0] == file_version:
+                region_configs = cached_conf[1]
+            else:
+                with open(filename, 'rb') as f:
+                    endpoint_config = f.read()
+
+                region_configs = _json_loads(endpoint_config)
+
+                # Validate the endpoints once for each version of the file, so requests do not check the region names
+                valid_region_configs = [regional_conf for regional_conf in region_configs
+                                        if isinstance(regional_conf, dict) and isinstance(regional_conf.get('region'), str) and regional_conf['region']
+                                        and 'next_available_time' in regional_conf]
+
+                if len(valid_region_configs) < len(region_configs):
+                    self.log_error("Skip %d invalid endpoint(s) in the configuration file %s", len(region_configs) - len(valid_region_configs), filename)
+
+                region_configs = valid_region_configs
+
+                with _CONF_CACHE_LOCK:
+                    _CONF_CACHE[filename] = (file_version, region_configs)
+
+            # Copy the region configurations, as disable_region_in_conf() updates them for each instance
+            self.raw_region_configs = [dict(regional_conf) for regional_conf in region_configs]
+            self._region_index = {regional_conf['region']: regional_conf for regional_conf in self.raw_region_configs}
             
         except Exception as e:
-            error_msg = f"Error: Load configuration file failed! {str(e)}"
-            self.error_logs.append(error_msg)
-            self.debug(error_msg)
+            self.log_error("Error: Load configuration file failed! %s", e)
 
         return self
 
+    @staticmethod
+    def clear_conf_cache():
+        """Clear the cache of parsed endpoint configuration files, so they are read again on next load"""
+        with _CONF_CACHE_LOCK:
+            _CONF_CACHE.clear()
+
+    @staticmethod
+    def flush_config_updates():
+        """Wait until the endpoint configuration updates queued by close() are written"""
+        _wait_for_config_updates()
+
     def get_validate_regions_from_conf(self, region_configs=[]):
         """
         Filter the list of endpoints to keep only the available endpoints in descending order
         based on each endpoint's next available time.
 
         When primary endpoints are set, prioritize primary endpoints.
+        When LATENCY_BASED_ROUTING is True, order endpoints by their smoothed latency. One endpoint without latency records
+        goes first to be measured, and the other unmeasured endpoints go last.
 
         Args:
             region_configs (list) -- The list of endpoints, loaded from the "bedrock_endpoints" by default. Overwrite the list.
@@ -148,29 +553,46 @@ class BedrockConnectHelper:
         """
         validate_regions = []
         primary_regions = []
+        now = time.monotonic()
 
-        if not region_configs and hasattr(self, 'raw_region_configs'):
+        if not region_configs:
             region_configs = self.raw_region_configs
 
         for regional_conf in region_configs:
-            self.debug('### REGION CONF:' + str(regional_conf))
+            if self.debug_mode:
+                self._log('### REGION CONF:%s', regional_conf)
 
-            if regional_conf['next_available_time'] <= self.current_time:
-                if self.PRIMARY_REGION_RANDOM_DISTRIBUTION and regional_conf['primary']:
+            if regional_conf['next_available_time'] <= self.current_time and not self.is_region_tripped(regional_conf['region'], now):
+                if self.PRIMARY_REGION_RANDOM_DISTRIBUTION and regional_conf.get('primary', False):
                     primary_regions.append(regional_conf['region'])
                 else:
                     validate_regions.append(regional_conf['region'])
 
+        if self.LATENCY_BASED_ROUTING:
+            latencies = {regional_conf['region']: regional_conf.get('latency') for regional_conf in region_configs}
+            explored_region = None
+
+            # Explore one unmeasured endpoint at a time, instead of putting all of them ahead of the measured ones
+            for region_name in primary_regions + validate_regions:
+                if latencies[region_name] is None:
+                    if explored_region is None:
+                        explored_region = region_name
+                        latencies[region_name] = -1
+                    else:
+                        latencies[region_name] = math.inf
+
+            primary_regions.sort(key=latencies.get)
+            validate_regions.sort(key=latencies.get)
+
         # Select one primary region randomly and add the primary regins to the front of the region list
         if self.PRIMARY_REGION_RANDOM_DISTRIBUTION and primary_regions:
             primary_region_num = len(primary_regions)
 
-            if primary_region_num > 1:
+            if primary_region_num > 1 and not self.LATENCY_BASED_ROUTING:
                 first_region_index = random.randrange(primary_region_num)
-                
-                first_region = primary_regions[first_region_index]
-                primary_regions.pop(first_region_index)
-                primary_regions.insert(0, first_region)
+
+                # Swap the selected region with the first one, instead of shifting the list
+                primary_regions[0], primary_regions[first_region_index] = primary_regions[first_region_index], primary_regions[0]
 
             validate_regions = primary_regions + validate_regions
 
@@ -183,6 +605,18 @@ class BedrockConnectHelper:
     def set_cross_region_inference(self, enable_cross_region):
         self.ENABLE_CROSS_REGION_INFERENCE = enable_cross_region
 
+        # Resolve the inference profile IDs of available regions once, instead of for every request
+        if enable_cross_region:
+            for region_name in self.validate_regions:
+                self.get_runtime_model_id(region_name)
+
+        return self
+
+    def set_hedge_fanout(self, k=2):
+        """Set the number of regions a request is sent to concurrently"""
+        if k and k > 0:
+            self.HEDGE_FANOUT = k
+
         return self
 
     def set_api_method(self, api_method):
@@ -203,7 +637,7 @@ class BedrockConnectHelper:
 
     def set_inference_config(self, configs, additional_configs=None):
         if configs:
-            self.inferenceConfig = configs
+            self.inferenceConfig = dict(configs) # Accept any mapping, as botocore only accepts dict parameters
 
         if additional_configs:
             self.additionalModelRequestFields = additional_configs
@@ -218,7 +652,7 @@ class BedrockConnectHelper:
 
     def set_guardrail_config(self, guardrail_configs):
         if guardrail_configs:
-            self.guardrail_configs = guardrail_configs
+            self.guardrailConfig = guardrail_configs
 
         return self
 
@@ -237,63 +671,77 @@ class BedrockConnectHelper:
         """
 
         if api_request_kwargs is None:
-            self.debug("Invalid API PARAMS!\n")
+            self._log("Invalid API PARAMS!\n")
             return api_request_kwargs
 
         if api_method:
             self.set_api_method(api_method)
 
-        if self.api_method in ["converse", "converse_stream"]:
+        if self.api_method in _CONVERSE_APIS:
             # Pre-defined valid parameters of Bedrock Converse API
-            attributes = ['inferenceConfig', 'toolConfig', 'guardrailConfig', 'additionalModelRequestFields', 'additionalModelResponseFieldPaths']
+            attributes = _CONVERSE_OPTIONAL_PARAMS
+            get_attributes = _get_converse_optional_params
 
-        elif self.api_method in ['invoke_model', 'invoke_model_with_response_stream']:
-            attributes = ['contentType', 'accept', 'trace', 'guardrailIdentifier', 'guardrailVersion']
+        elif self.api_method in _INVOKE_APIS:
+            attributes = _INVOKE_OPTIONAL_PARAMS
+            get_attributes = _get_invoke_optional_params
 
-        # Iterate all optional parameter names and get their values
-        for attr_name in attributes:
-            instance_attribute = getattr(self, attr_name)
-            self.debug(f"## INSTANCE ATTRIBUTE {attr_name}:\n{instance_attribute}")
+        # Get the values of all optional parameters at once, and add the non-empty ones
+        instance_attributes = get_attributes(self)
+        if self.debug_mode:
+            self._log("## INSTANCE ATTRIBUTES:\n%s", dict(zip(attributes, instance_attributes)))
 
-            if instance_attribute:
-                if api_request_kwargs is not None:
-                    api_request_kwargs.update({attr_name: instance_attribute})
-                else:
-                    api_request_kwargs = {attr_name: instance_attribute}
+        api_request_kwargs.update({attr_name: instance_attribute for attr_name, instance_attribute in zip(attributes, instance_attributes) if instance_attribute})
 
         return api_request_kwargs
 
-    def extract_response(self, key='content', depth=2):
+    def extract_response(self, key='content', depth=2, response=None):
         """Extract an attribute from LLM response JSON
         Args:
             api_method(string): Converse API or InvokeModel API
             streaming(bool):
             key (string): Attribute name to extract; enum [content, usage]
             depth (int): 
+            response (dict): The API response to extract from. The latest response of the instance by default.
         """
         output = None
 
-        if self.response is not None:
+        if response is None:
+            response = self.response
+
+        if response is not None:
 
             if self.api_method == 'converse':
 
-                if (key == 'content' and 'output' in self.response
-                    and 'message' in self.response['output']):
+                if key == 'content':
                     # Retrieve Content
-                    output = self.response['output']['message'][key]
-                elif key == 'usage' and key in self.response:
-                    output = self.response[key]
+                    message = response.get('output', {}).get('message')
+
+                    if message:
+                        output = message.get(key)
+                elif key == 'usage':
+                    output = response.get(key)
             
             elif self.api_method == 'converse_stream':
-                output = self.response.get('stream')
+                output = response.get('stream')
                 self.stream_data = output
                 depth = 0
 
             elif self.api_method == 'invoke_model':
-                output = json.loads(self.response.get('body').read())[key]
+                # The response body is a stream, which can only be read once, so keep the decoded body with its response.
+                # Concurrent requests replace the cached body, so only use it when it belongs to the given response.
+                cached_body = self._response_body
+
+                if cached_body is not None and cached_body[0] is response:
+                    response_body = cached_body[1]
+                else:
+                    response_body = _json_loads(response.get('body').read())
+                    self._response_body = (response, response_body)
+
+                output = response_body[key]
 
             elif self.api_method == "invoke_model_with_response_stream":
-                output = self.response.get('body')
+                output = response.get('body')
                 self.stream_data = output
                 depth = 0
         
@@ -315,7 +763,7 @@ class BedrockConnectHelper:
             if self.api_method: # Use BedrockConnectUtil object
                 bedrock_util = self.bedrock_utilities[self.api_method]
                 stream_data = bedrock_util.retrieve_response_stream_chunk(self.stream_data, contentOnly)
-                self.debug(f"## Stream data:\n{stream_data}")
+                self._log("## Stream data:\n%s", stream_data)
 
                 if stream_data:
                     output = self.bedrock_utilities[self.api_method].retrieve_response_streamdata(stream_data, contentOnly)
@@ -323,6 +771,45 @@ class BedrockConnectHelper:
         return output
 
 
+    def iter_stream(self, contentOnly=True):
+        """
+        Iterate streaming response data, yielding each chunk as soon as it arrives
+
+        Args:
+            contentOnly (bool): Yield the text of each content delta when given True. Yield each decoded event when given False.
+
+        Returns:
+            Iterator
+        """
+        if not self.stream_data:
+            return
+
+        bedrock_util = self.bedrock_utilities[self.api_method]
+
+        try:
+            for chunk_data in bedrock_util.retrieve_response_stream_chunk(self.stream_data, contentOnly):
+                if not contentOnly:
+                    yield chunk_data
+                elif 'text' in chunk_data:
+                    yield chunk_data['text']
+
+        except botocore.exceptions.EventStreamError as e:
+            self._log("Error processing event stream: %s", e)
+
+
+    async def aiter_stream(self, contentOnly=True):
+        """An async variant of iter_stream(), which reads each chunk in a worker thread"""
+        stream = self.iter_stream(contentOnly)
+
+        while True:
+            chunk_data = await asyncio.to_thread(next, stream, None)
+
+            if chunk_data is None:
+                break
+
+            yield chunk_data
+
+
     def bedrock_converse_with_retry(self, messages, system=[], extract_content=False):
         """
         Send a request to Amazon Bedrock Converse API and retry according to related configurations
@@ -336,136 +823,551 @@ class BedrockConnectHelper:
         output = False
 
         if not messages:
-            error_msg = 'Argument "messages" is invalid!'
-            self.error_logs.append(error_msg)
-            self.debug(error_msg)
+            self.log_error('Argument "messages" is invalid!')
 
             return False
 
+        if self.LATENCY_BASED_ROUTING:
+            self.get_validate_regions_from_conf() # Re-order available endpoints with the latest latency records
+
         if not self.validate_regions:
-            error_msg = 'No available endpoint!'
-            self.error_logs.append(error_msg)
-            self.debug(error_msg)
+            self.log_error('No available endpoint!')
 
             return False
 
+        if self.api_method not in self.VALID_BEDROCK_APIS:
+            self.log_error('API method "%s" is invalid!', self.api_method)
+
+            return False
+
+        if self.HEDGE_FANOUT > 1:
+            return self.bedrock_converse_hedged(messages, system=system, extract_content=extract_content)
+
+        # The API arguments are the same for all regions, except for the model ID
+        llm_api_kwargs = self.build_api_kwargs(messages, system)
         retry_time = 0
-        model_id = self.model_id # Need a runtime model_id because of Bedrock cross-region inference profile ID.
 
-        for region_name in self.validate_regions: # Loop through available endpoints until configured exit criteria is met.
+        for region_name in self.get_request_regions(): # Loop through available endpoints until configured exit criteria is met.
+
+            # Check the retry budget before resolving the model ID and the client of the region
+            if retry_time >= self.MAX_RETRY_TIME:
+                break
+
+            model_id = self.get_runtime_model_id(region_name) # Need a runtime model_id because of Bedrock cross-region inference profile ID.
 
-            if region_name is not None and retry_time < self.MAX_RETRY_TIME:
-                region_profile_prefix = ''
+            for one_region_retry_time in range(self.MAX_RETRY_TIMES_FOR_EACH_REGION):
+                # Retry the request to one region
 
-                bedrock = boto3.client('bedrock-runtime', region_name=region_name, config=self.config) # Initialize a regional Bedrock client
+                if retry_time >= self.MAX_RETRY_TIME:
+                    break
 
-                # Assign the bedrock method to a variable
-                call_bedrock_runtime_api = getattr(bedrock, self.api_method)
-                self.debug(f"\n# Use region: {region_name} via API {self.api_method}\n")
+                try:
+                    response = self._call_region(region_name, llm_api_kwargs, model_id)
 
-                # Construct Bedrock Cross-region inference profile ID
-                if self.ENABLE_CROSS_REGION_INFERENCE:
-                    region_profile_prefix = next((regional_data['region_profile_prefix'] for regional_data in self.raw_region_configs if regional_data['region'] == region_name), None)
+                    if response:
+                        self.response = response
+                        self._response_body = None
 
-                    if region_profile_prefix:
-                        model_id = region_profile_prefix + '.' + self.model_id
+                        if extract_content:
+                            return self.extract_response('content', response=response)
+                        else:
+                            return response
                     else:
-                        self.debug(f"Failed to construct regional cross-region inference profile ID!\n")
-
-                for one_region_retry_time in range(self.MAX_RETRY_TIMES_FOR_EACH_REGION):
-                    # Retry the request to one region
-
-                    if retry_time < self.MAX_RETRY_TIME:
-
-                        try:
-
-                            # Construct API arguments based on API method name
-                            if self.api_method in ['converse', 'converse_stream']:
-
-                                llm_api_kwargs = {
-                                    'modelId': model_id,
-                                    'messages': messages,
-                                    'system': system
-                                }
-
-                            elif self.api_method in ['invoke_model', 'invoke_model_with_response_stream']:
-
-                                llm_api_kwargs = {
-                                    'modelId': model_id,
-                                    'body': messages,
-                                }
-                            else:
-                                break # Better handle errors
-
-                            # Add optional LLM API parameters based on the API name
-                            llm_api_kwargs = self.constract_api_kwargs(llm_api_kwargs)
-                            self.debug(f"## ADD API KWARGS:\n {llm_api_kwargs}\n")
-
-                            # Call LLM API Bedrock Converse
-                            if llm_api_kwargs is not None:
-                                # Pass required parameters and optional parameters to the LLM API
-                                response = call_bedrock_runtime_api(**llm_api_kwargs)
-                            else:
-                                self.debug(f"Failed! No valid parameters for the API request at LINE []!\n")
-                                return False # @TODO: It should raise an exception
-
-                            self.debug(f"Inference modelID: {model_id}")
-
-                            if response:
-                                self.response = response
-
-                                if extract_content:
-                                    return self.extract_response('content')
-                                else:
-                                    return response
-                            else:
-                                if one_region_retry_time == 0:
-                                    self.failed_regions.append(region_name) # Add the region to the failed region list
-
-                                retry_time += 1
-                                continue
-                        except (bedrock.exceptions.ValidationException, botocore.exceptions.ParamValidationError) as e:
-                            """ Do not add endpoints to failed regions for ValidationException or ParamValidationError,
-                                to prevent from unexpected removing all available endpoints.
-                            """
-                            error_msg = f"ERROR: Invoke '{model_id}' error. Reason: {e}"
-                            self.error_logs.append(error_msg)
-                            self.debug(error_msg)
-
-                            retry_time += 1
-
-                            continue
-                        except (botocore.exceptions.ClientError, Exception) as e:
-                            error_msg = f"ERROR: Can't invoke '{model_id}'. Reason: {e}"
-                            self.error_logs.append(error_msg)
-                            self.debug(error_msg)
-                            
-                            if one_region_retry_time == 0:
-                                self.failed_regions.append(region_name) # Add the region to the failed region list
-
-                            retry_time += 1
-                            continue
+                        if one_region_retry_time == 0:
+                            self.add_failed_region(region_name)
+
+                        retry_time += 1
+                        continue
+                except Exception as e:
+                    if not self._handle_request_error(e, region_name, model_id, add_failed_region=(one_region_retry_time == 0)):
+                        return False
+
+                    retry_time += 1
+
+                    # Back off before retrying the same region, when it is throttled or unavailable
+                    if one_region_retry_time + 1 < self.MAX_RETRY_TIMES_FOR_EACH_REGION and retry_time < self.MAX_RETRY_TIME:
+                        backoff_delay = self.get_backoff_delay(e, one_region_retry_time)
+
+                        if backoff_delay:
+                            time.sleep(backoff_delay)
+
+                    continue
+
+        return False
+
+
+    def get_runtime_model_id(self, region_name):
+        """
+        Get the model ID for the request to a region
+
+        Return the Bedrock cross-region inference profile ID when the cross-region inference is enabled.
+        Inference profile IDs are cached for each region and model ID.
+
+        Args:
+            region_name (string): The region to send the request to.
+        """
+        model_id = self.model_id
+
+        if not self.ENABLE_CROSS_REGION_INFERENCE:
+            return model_id
+
+        # Reuse the inference profile ID constructed by previous requests
+        profile_key = (region_name, self.model_id)
+
+        if profile_key in self.inference_profile_ids:
+            return self.inference_profile_ids[profile_key]
+
+        # Construct Bedrock Cross-region inference profile ID
+        region_profile_prefix = self._region_index.get(region_name, {}).get('region_profile_prefix')
+
+        if region_profile_prefix:
+            model_id = region_profile_prefix + '.' + self.model_id
+        else:
+            self._log("Failed to construct regional cross-region inference profile ID!\n")
+
+        self.inference_profile_ids[profile_key] = model_id
+
+        return model_id
+
+
+    def get_bedrock_client(self, region_name):
+        """
+        Get the Bedrock runtime client of a region
+
+        Clients are initialized on first use, or by prewarm_clients(), and shared by all instances with the same botocore config,
+        so their HTTP connection pools are kept alive between requests.
+
+        Args:
+            region_name (string): The region of the client.
+        """
+        return self._get_client_entry(region_name)[0]
+
+
+    def _get_client_key(self, region_name):
+        """
+        Get the key of a regional client in the shared client cache
+
+        The key includes all botocore config settings, the endpoint URL and boto3's default session,
+        so clients are created again when the default session, and its credentials, change.
+        """
+        return (region_name, self.read_timeout, self.connect_timeout, self.tcp_keepalive, self.max_pool_connections, self.ENDPOINT_URL_TEMPLATE,
+                _get_boto3_default_session())
+
+
+    def _get_client_entry(self, region_name):
+        """
+        Get the Bedrock runtime client of a region, and its bound API methods
+
+        Returns:
+            Tuple: (client, {API method name: bound method of the client})
+        """
+        global _BOTOCORE_SESSION
+
+        client_key = self._get_client_key(region_name)
+        client_entry = _CLIENT_CACHE.get(client_key)
+
+        if client_entry is None:
+            # botocore sessions are not thread-safe, so serialize the client creation for concurrent requests
+            with _CLIENT_CACHE_LOCK:
+                client_entry = _CLIENT_CACHE.get(client_key)
+
+                if client_entry is None:
+                    # Create the clients with a botocore session directly, as boto3 only wraps it for the Bedrock runtime clients.
+                    # Use the botocore session of boto3's default session when it is set up, so its credentials and profile are used.
+                    boto3_session = client_key[-1]
+
+                    if boto3_session is not None:
+                        botocore_session = boto3_session._session
                     else:
+                        if _BOTOCORE_SESSION is None:
+                            # Import it when the first client is needed, as it is slow to import
+                            import botocore.session
+                            _BOTOCORE_SESSION = botocore.session.Session()
+
+                        botocore_session = _BOTOCORE_SESSION
+
+                    # Use the pre-formatted endpoint URL when it is set, instead of resolving it from the botocore endpoint data
+                    endpoint_url = self.ENDPOINT_URL_TEMPLATE.format(region=region_name) if self.ENDPOINT_URL_TEMPLATE else None
+
+                    bedrock = botocore_session.create_client('bedrock-runtime', region_name=region_name, endpoint_url=endpoint_url,
+                                                             config=self.config) # Initialize a regional Bedrock client
+
+                    # Resolve the API methods once for all requests with the client
+                    client_entry = (bedrock, {api_method: getattr(bedrock, api_method) for api_method in self.VALID_BEDROCK_APIS})
+                    _CLIENT_CACHE[client_key] = client_entry
+
+        return client_entry
+
+
+    def build_api_kwargs(self, messages, system=[]):
+        """
+        Construct the API arguments shared by the requests to all regions
+
+        The model ID is not included, as it is resolved for each region.
+
+        Args:
+            messages (list): Prompts for Converse APIs, or the request body for InvokeModel APIs.
+            system (list): System prompts.
+
+        Returns:
+            Dictionary: The required and optional API arguments.
+        """
+        # Construct API arguments based on API method name
+        if self.api_method in _CONVERSE_APIS:
+
+            llm_api_kwargs = {
+                'messages': messages,
+                'system': system
+            }
+
+        elif self.api_method in _INVOKE_APIS:
+
+            llm_api_kwargs = {
+                'body': messages,
+            }
+
+        # Add optional LLM API parameters based on the API name
+        llm_api_kwargs = self.constract_api_kwargs(llm_api_kwargs)
+
+        # Only format the request arguments, which include the prompts, in debug mode
+        if self.debug_mode:
+            self._log("## ADD API KWARGS:\n %s\n", llm_api_kwargs)
+
+        return llm_api_kwargs
+
+
+    def prewarm_clients(self):
+        """
+        Create the Bedrock runtime clients of the available regions
+
+        The client of the first region, which the first request uses, is created at once. The clients of the other regions
+        are created in the background afterwards, so the first request does not wait for them on the client cache lock.
+        Clients are shared by all instances, so only the clients which do not exist yet are created.
+
+        Returns:
+            List: The futures of the client creations in the background.
+        """
+        futures = []
+
+        if not self.validate_regions:
+            return futures
+
+        try:
+            self.get_bedrock_client(self.validate_regions[0])
+        except Exception as e:
+            # The request to the region creates the client again and handles the error
+            self.log_error("Create the client of %s failed! %s", self.validate_regions[0], e, level=logging.WARNING)
+
+        executor = _get_executor()
+
+        for region_name in self.validate_regions[1:]:
+            if self._get_client_key(region_name) not in _CLIENT_CACHE:
+                futures.append(executor.submit(self.get_bedrock_client, region_name))
+
+        return futures
+
+
+    def _call_region(self, region_name, llm_api_kwargs, model_id):
+        """
+        Send one request to the Bedrock API in a region
+
+        Args:
+            region_name (string): The region to send the request to.
+            llm_api_kwargs (dict): The API arguments from build_api_kwargs(), which are not modified.
+            model_id (string): The runtime model ID.
+
+        Returns:
+            Dictionary: The raw API response. Exceptions from the API request are not handled.
+        """
+        bedrock, api_methods = self._get_client_entry(region_name)
+
+        # Assign the bedrock method to a variable
+        call_bedrock_runtime_api = api_methods[self.api_method]
+
+        if self.debug_mode:
+            self._log("\n# Use region: %s via API %s\n", region_name, self.api_method)
+
+        # Pass required parameters and optional parameters to the LLM API
+        request_start_time = time.monotonic()
+
+        try:
+            response = call_bedrock_runtime_api(modelId=model_id, **llm_api_kwargs)
+        except Exception as error:
+            # A failed request records a penalty latency, so a failing endpoint is not routed to first again.
+            # Errors of the request itself or the credentials are not caused by the region.
+            if self.LATENCY_BASED_ROUTING and not self.is_fatal_error(error):
+                self.update_region_latency(region_name, max(time.monotonic() - request_start_time, self.connect_timeout + self.read_timeout))
+
+            raise
+
+        if self.debug_mode:
+            self._log("Inference modelID: %s", model_id)
+
+        if self.LATENCY_BASED_ROUTING:
+            self.update_region_latency(region_name, time.monotonic() - request_start_time)
+
+        return response
+
+
+    def get_request_regions(self):
+        """
+        Get the available endpoints for a request
+
+        Skip the regions which failed in previous requests of this instance, until their next available time.
+        When all available endpoints failed, return all of them, so that the request is still sent.
+        """
+        now = time.monotonic()
+        request_regions = []
+
+        for region_name in self.validate_regions:
+            if not self.is_region_tripped(region_name, now):
+                request_regions.append(region_name)
+
+        if not request_regions:
+            request_regions = list(self.validate_regions)
+
+        return request_regions
+
+
+    def add_failed_region(self, region_name):
+        """
+        Add a region to the failed region list, and skip it in the following requests until its next available time
+
+        Args:
+            region_name (string): The region of the failed request.
+        """
+        self.failed_regions.append(region_name)
+        self._breaker[region_name] = (time.monotonic() + self.NEXT_RETRY_TIME_WINDOW, int(time.time()) + self.NEXT_RETRY_TIME_WINDOW)
+
+
+    def is_region_tripped(self, region_name, now=None):
+        """
+        Whether a region failed in a previous request of this instance, and its next available time has not been reached
+
+        Args:
+            region_name (string): The region to check.
+            now (float): The current time.monotonic() value, to check many regions with one clock read.
+        """
+        breaker_state = self._breaker.get(region_name)
+
+        if breaker_state is None:
+            return False
+
+        if now is None:
+            now = time.monotonic()
+
+        return breaker_state[0] > now
+
+
+    def update_region_latency(self, region_name, latency):
+        """
+        Update the smoothed latency of an endpoint with the latency of a successful request, or the penalty latency of a failed one
+
+        The smoothed latency is an exponentially weighted moving average, which is kept in the endpoint's configuration,
+        so it is written back to the configuration file with the next available times.
+
+        Args:
+            region_name (string): The region of the request.
+            latency (float): The request latency in seconds.
+        """
+        regional_conf = self._region_index.get(region_name)
+
+        if regional_conf is None:
+            return
+
+        previous_latency = regional_conf.get('latency')
+
+        if previous_latency is None:
+            smoothed_latency = latency
+        else:
+            smoothed_latency = (1 - self.LATENCY_EWMA_WEIGHT) * previous_latency + self.LATENCY_EWMA_WEIGHT * latency
+
+        regional_conf['latency'] = round(smoothed_latency, 3)
+        self.latency_updated = True
+
+
+    def _handle_request_error(self, error, region_name, model_id, add_failed_region=True):
+        """
+        Log an error of the request to a region, and add the region to the failed region list when the region is at fault
+
+        Args:
+            error (Exception): The exception raised by the API request.
+            region_name (string): The region of the failed request.
+            model_id (string): The runtime model ID.
+            add_failed_region (bool): Whether to add the region to the failed region list.
+
+        Returns:
+            Bool: True when the request can be retried, False when the request itself or the credentials are invalid.
+        """
+        if self.is_fatal_error(error):
+            self.log_error("ERROR: Invoke '%s' error. Reason: %s", model_id, error)
+
+            return False
+
+        if (isinstance(error, botocore.exceptions.ClientError)
+            and error.response.get('Error', {}).get('Code') in self.REGION_ERROR_CODES):
+            """ Do not add endpoints to failed regions for region-dependent errors,
+                to prevent from unexpected removing all available endpoints.
+            """
+            pass
+        elif add_failed_region:
+            self.add_failed_region(region_name)
+
+        # The request is retried in other regions, so log a warning
+        self.log_error("Can't invoke '%s'. Reason: %s", model_id, error, level=logging.WARNING)
+
+        return True
+
+
+    def is_fatal_error(self, error):
+        """
+        Check whether an error is caused by the request itself or the credentials, so retrying it in any region fails in the same way
+
+        Args:
+            error (Exception): The exception raised by the API request.
+
+        Returns:
+            Bool
+        """
+        if isinstance(error, (botocore.exceptions.ParamValidationError, botocore.exceptions.NoCredentialsError)):
+            return True
+
+        if isinstance(error, botocore.exceptions.ClientError):
+            return error.response.get('Error', {}).get('Code') in self.FATAL_ERROR_CODES
+
+        return False
+
+
+    def get_backoff_delay(self, error, attempt):
+        """
+        Get the delay before retrying a region, with exponential backoff and full jitter
+
+        Only throttling and server errors are delayed, other errors are retried immediately.
+
+        Args:
+            error (Exception): The exception raised by the API request.
+            attempt (int): The number of previous attempts to the region, starting from 0.
+
+        Returns:
+            Float: The delay in seconds.
+        """
+        if not isinstance(error, botocore.exceptions.ClientError):
+            return 0
+
+        error_code = error.response.get('Error', {}).get('Code')
+        status_code = error.response.get('ResponseMetadata', {}).get('HTTPStatusCode', 0)
+
+        if error_code not in self.BACKOFF_ERROR_CODES and status_code < 500:
+            return 0
+
+        return random.uniform(0, min(self.MAX_BACKOFF, self.BASE_BACKOFF * (2 ** attempt)))
+
+
+    def bedrock_converse_hedged(self, messages, system=[], extract_content=False):
+        """
+        Send a request to the first HEDGE_FANOUT available regions concurrently and return the first valid response.
+        With HEDGE_DELAY, the request to each next region is only sent when no earlier request completes within the delay.
+
+        When the request to a region fails, the request is sent to the next available region, until a valid response
+        is returned or MAX_RETRY_TIME requests are sent. Each region is requested once. Requests still queued when a
+        valid response is returned are cancelled, and the results of requests in flight are discarded.
+
+        Args:
+            messages (list): Prompts for Bedrock API request.
+            system (list): System prompts.
+            extract_content (bool): Return the raw API response when given False. Only return the "content" when given True.
+        """
+        executor = _get_executor()
+        llm_api_kwargs = self.build_api_kwargs(messages, system)
+        regions = iter(self.get_request_regions())
+        futures = {}
+        retry_time = 0
+
+        # A request sends one attempt, so it completes within its timeouts. Do not wait longer, e.g. for a stuck thread pool.
+        wait_timeout = self.connect_timeout + self.read_timeout
+
+        def dispatch_next_region():
+            nonlocal retry_time
+
+            region_name = next(regions, None)
+
+            if region_name is None or retry_time >= self.MAX_RETRY_TIME:
+                return False
+
+            retry_time += 1
+            model_id = self.get_runtime_model_id(region_name)
+
+            future = executor.submit(self._call_region, region_name, llm_api_kwargs, model_id)
+            futures[future] = (region_name, model_id)
+
+            return True
+
+        try:
+            for i in range(self.HEDGE_FANOUT):
+                if i and self.HEDGE_DELAY:
+                    # Only hedge the requests which have not completed within the delay
+                    done, pending = concurrent.futures.wait(futures, timeout=self.HEDGE_DELAY, return_when=concurrent.futures.FIRST_COMPLETED)
+
+                    if done:
                         break
-            else:
-                break
+
+                if not dispatch_next_region():
+                    break
+
+            while futures:
+                done, pending = concurrent.futures.wait(futures, timeout=wait_timeout, return_when=concurrent.futures.FIRST_COMPLETED)
+
+                if not done:
+                    # The regions are not at fault, so they are not added to the failed regions
+                    self.log_error("Hedged requests did not complete within %s seconds!", wait_timeout)
+
+                    return False
+
+                for future in done:
+                    region_name, model_id = futures.pop(future)
+
+                    try:
+                        response = future.result()
+                    except Exception as e:
+                        if not self._handle_request_error(e, region_name, model_id):
+                            return False
+
+                        response = None
+                    else:
+                        if not response:
+                            self.add_failed_region(region_name)
+
+                    if response:
+                        self.response = response
+                        self._response_body = None
+
+                        if extract_content:
+                            return self.extract_response('content', response=response)
+                        else:
+                            return response
+
+                    dispatch_next_region()
+        finally:
+            # Cancel the requests which are no longer needed
+            for future in futures:
+                future.cancel()
 
         return False
 
 
-    def converse(self, messages, system=[], modelId='', inferenceConfig={},
-            toolConfig={}, guardrailConfig={}, additionalModelRequestFields=None,
-            additionalModelResponseFieldPaths=[]):
-        """A mask method of BedrockRuntime.Client.converse()
+    async def bedrock_converse_hedged_async(self, messages, system=[], extract_content=False):
+        """
+        An awaitable variant of bedrock_converse_hedged()
 
-            Doc: https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/bedrock-runtime/client/converse.html
+        The hedged requests already run in the shared thread pool, so run bedrock_converse_hedged() in a worker thread.
         """
-        output = None
+        return await asyncio.to_thread(self.bedrock_converse_hedged, messages, system=system, extract_content=extract_content)
 
-        if not messages:
-            return output
 
-        self.set_api_method('converse')
+    def set_converse_params(self, api_method, modelId='', inferenceConfig={}, toolConfig={}, guardrailConfig={},
+            additionalModelRequestFields=None):
+        """Set the API method and optional parameters for Converse & ConverseStream APIs"""
+        self.set_api_method(api_method)
 
         if modelId:
             self.set_model_id(modelId)
@@ -479,6 +1381,39 @@ class BedrockConnectHelper:
         if guardrailConfig:
             self.set_guardrail_config(guardrailConfig)
 
+        return self
+
+
+    def set_invoke_model_params(self, api_method, modelId='', **kwargs):
+        """Set the API method and optional parameters for InvokeModel & InvokeModelWithResponseStream APIs"""
+        self.set_api_method(api_method)
+
+        if modelId:
+            self.model_id = modelId
+        
+        for attr_name, default_value in _INVOKE_KWARG_DEFAULTS:
+            setattr(self, attr_name, kwargs.get(attr_name, default_value))
+
+        # Tracing is disabled unless it is enabled explicitly
+        self.trace = 'ENABLED' if kwargs.get('trace') == 'ENABLED' else 'DISABLED'
+
+        return self
+
+
+    def converse(self, messages, system=[], modelId='', inferenceConfig={},
+            toolConfig={}, guardrailConfig={}, additionalModelRequestFields=None,
+            additionalModelResponseFieldPaths=[]):
+        """A mask method of BedrockRuntime.Client.converse()
+
+            Doc: https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/bedrock-runtime/client/converse.html
+        """
+        output = None
+
+        if not messages:
+            return output
+
+        self.set_converse_params('converse', modelId, inferenceConfig, toolConfig, guardrailConfig, additionalModelRequestFields)
+
         return self.bedrock_converse_with_retry(messages, system=system)
 
 
@@ -492,22 +1427,10 @@ class BedrockConnectHelper:
 
         output = None
 
-        self.set_api_method('converse_stream')
-
         if not messages:
             return output
 
-        if modelId:
-            self.set_model_id(modelId)
-
-        if inferenceConfig:
-            self.set_inference_config(inferenceConfig, additionalModelRequestFields)
-
-        if toolConfig:
-            self.set_tool_config(toolConfig)
-
-        if guardrailConfig:
-            self.set_guardrail_config(guardrailConfig)
+        self.set_converse_params('converse_stream', modelId, inferenceConfig, toolConfig, guardrailConfig, additionalModelRequestFields)
 
         return self.bedrock_converse_with_retry(messages, system=system)
 
@@ -519,34 +1442,10 @@ class BedrockConnectHelper:
         """
         output = None
 
-        self.set_api_method('invoke_model')
-
         if not body:
             return output
 
-        if modelId:
-            self.model_id = modelId
-        
-        if 'contentType' in kwargs:
-            self.contentType = kwargs['contentType']
-
-        if 'accept' in kwargs:
-            self.accept = kwargs['accept']
-
-        if 'trace' in kwargs and kwargs['trace'] == 'ENABLED':
-            self.trace = trace
-        else:
-            self.trace = 'DISABLED'
-
-        if 'guardrailIdentifier' in kwargs:
-            self.guardrailIdentifier = kwargs['guardrailIdentifier']
-        else:
-            self.guardrailIdentifier = None
-
-        if 'guardrailVersion' in kwargs:
-            self.guardrailVersion = kwargs['guardrailVersion']
-        else:
-            self.guardrailVersion = None
+        self.set_invoke_model_params('invoke_model', modelId, **kwargs)
 
         return self.bedrock_converse_with_retry(messages=body)
 
@@ -558,36 +1457,84 @@ class BedrockConnectHelper:
         """
         output = None
 
-        self.set_api_method('invoke_model_with_response_stream')
-
         if not body:
             return output
 
-        if modelId:
-            self.model_id = modelId
-        
-        if 'contentType' in kwargs:
-            self.contentType = kwargs['contentType']
+        self.set_invoke_model_params('invoke_model_with_response_stream', modelId, **kwargs)
 
-        if 'accept' in kwargs:
-            self.accept = kwargs['accept']
+        return self.bedrock_converse_with_retry(messages=body)
 
-        if 'trace' in kwargs and kwargs['trace'] == 'ENABLED':
-            self.trace = trace
-        else:
-            self.trace = 'DISABLED'
 
-        if 'guardrailIdentifier' in kwargs:
-            self.guardrailIdentifier = kwargs['guardrailIdentifier']
-        else:
-            self.guardrailIdentifier = None
+    async def bedrock_converse_with_retry_async(self, messages, system=[], extract_content=False):
+        """
+        An awaitable variant of bedrock_converse_with_retry()
 
-        if 'guardrailVersion' in kwargs:
-            self.guardrailVersion = kwargs['guardrailVersion']
-        else:
-            self.guardrailVersion = None
+        Run bedrock_converse_with_retry(), which sends hedged requests when HEDGE_FANOUT is greater than 1, in a worker thread.
+        """
+        return await asyncio.to_thread(self.bedrock_converse_with_retry, messages, system=system, extract_content=extract_content)
 
-        return self.bedrock_converse_with_retry(messages=body)
+
+    async def bedrock_converse_batch_async(self, messages_list, system=[], extract_content=False):
+        """
+        Send a batch of independent requests concurrently, each of them with the retries of bedrock_converse_with_retry_async()
+
+        The requests share the instance's settings and regional clients, and their network waits overlap in worker threads.
+        The content of each request is extracted from its own response, while the "response" attribute keeps the latest one.
+
+        Args:
+            messages_list (list): The prompts of each request.
+            system (list): System prompts of all requests.
+            extract_content (bool): Return the raw API responses when given False. Only return the "content" when given True.
+
+        Returns:
+            List: The result of each request in the order of messages_list, False for failed requests.
+        """
+        return await asyncio.gather(*(self.bedrock_converse_with_retry_async(messages, system=system, extract_content=extract_content)
+                                      for messages in messages_list))
+
+
+    async def converse_async(self, messages, system=[], modelId='', inferenceConfig={},
+            toolConfig={}, guardrailConfig={}, additionalModelRequestFields=None,
+            additionalModelResponseFieldPaths=[]):
+        """An awaitable variant of converse()"""
+        if not messages:
+            return None
+
+        self.set_converse_params('converse', modelId, inferenceConfig, toolConfig, guardrailConfig, additionalModelRequestFields)
+
+        return await self.bedrock_converse_with_retry_async(messages, system=system)
+
+
+    async def converse_stream_async(self, messages, system=[], modelId='', inferenceConfig={},
+            toolConfig={}, guardrailConfig={}, additionalModelRequestFields=None,
+            additionalModelResponseFieldPaths=[]):
+        """An awaitable variant of converse_stream()"""
+        if not messages:
+            return None
+
+        self.set_converse_params('converse_stream', modelId, inferenceConfig, toolConfig, guardrailConfig, additionalModelRequestFields)
+
+        return await self.bedrock_converse_with_retry_async(messages, system=system)
+
+
+    async def invoke_model_async(self, body, modelId='', **kwargs):
+        """An awaitable variant of invoke_model()"""
+        if not body:
+            return None
+
+        self.set_invoke_model_params('invoke_model', modelId, **kwargs)
+
+        return await self.bedrock_converse_with_retry_async(messages=body)
+
+
+    async def invoke_model_with_response_stream_async(self, body, modelId='', **kwargs):
+        """An awaitable variant of invoke_model_with_response_stream()"""
+        if not body:
+            return None
+
+        self.set_invoke_model_params('invoke_model_with_response_stream', modelId, **kwargs)
+
+        return await self.bedrock_converse_with_retry_async(messages=body)
 
 
     def disable_region_in_conf(self, disable_regions=[]):
@@ -597,81 +1544,134 @@ class BedrockConnectHelper:
         Args:
             self.raw_region_configs (dict): The raw list of Bedrock endpoints from the "bedrock_endpoints" file.
             disable_regions (list): The endpoints to be calculated and set next available time.
+
+        Returns:
+            List: The updated endpoint configurations, or None when they have not changed since the last call.
         """
         # Calcuate failed endpoints' next available time
         next_timestamp = self.current_time + self.NEXT_RETRY_TIME_WINDOW
-        self.debug(f"## NEXT AVAILABLE TIME: {next_timestamp}")
+        self._log("## NEXT AVAILABLE TIME: %s", next_timestamp)
 
         if not disable_regions:
             disable_regions = self.failed_regions
 
-        disable_count = len(disable_regions)
+        # The latency records are returned once, and only updated regions mark the configurations as changed
+        config_changed = self.latency_updated
+        self.latency_updated = False
 
-        if disable_count == 0:
-            self.debug('No need to update bedrock_endpoints.conf')
-            return None
+        for region_name in set(disable_regions):
+            region_data = self._region_index.get(region_name)
 
-        for region_data in self.raw_region_configs:
-            if region_data['region'] in disable_regions:
-                region_data['next_available_time'] = next_timestamp
+            if region_data is not None:
+                breaker_state = self._breaker.get(region_name)
+                next_available_time = breaker_state[1] if breaker_state is not None else next_timestamp
+
+                if region_data['next_available_time'] != next_available_time:
+                    region_data['next_available_time'] = next_available_time
+                    config_changed = True
+
+        if not config_changed:
+            self._log('No need to update bedrock_endpoints.conf')
+            return None
 
         return self.raw_region_configs
 
 
     def write_json_to_file_with_lock(self, data):
         """
-        Overwrite the Bedrock endpoint configuration file with file locking to handle concurrent writes.
+        Overwrite the Bedrock endpoint configuration file atomically to handle concurrent writes.
+
+        The JSON data is written to a temporary file in the same directory, which then replaces the configuration file.
+        Readers always see either the previous or the new file, never a partially written one.
 
         Args:
             self.config_file_path (str): The path to the Bedrock endpoint configuration file where the JSON data will be written.
             data (list): The JSON data to write to the file.
         """
         if not data:
-            self.debug("JSON configurations are invalid!")
+            self._log("JSON configurations are invalid!")
             return False
 
-        # Convert the Python dictionary to a JSON string
-        json_data = json.dumps(data)
-
         try:
-            with open(self.config_file_path, 'w') as f:
-                fcntl.flock(f, fcntl.LOCK_EX)  # Acquire an exclusive lock on the file
-                f.write(json_data)
-                f.flush()
-                fcntl.flock(f, fcntl.LOCK_UN)  # Unlock the file
+            _write_json_file(self.config_file_path, data)
 
             return True
 
-        except IOError as e:
-            self.debug(f"Error writing to file: {e}")
+        except OSError as e:
+            self._log("Error writing to file: %s", e)
+
             return False
 
 
-    def __del__(self):
+    def close(self):
         """
-        Class Destructor
-        
-        Retrieve all failed endpoints and update next_available_time to them,
-        when the object is destroyed.
+        Retrieve all failed endpoints and update next_available_time to them in the configuration file,
+        when auto_update_config is True.
+
+        Only the first call updates the configuration file. Use the instance as a context manager to call it on exit:
+            with BedrockConnectHelper(model_id=model_id, auto_update_config=True) as bedrock_helper:
+                response = bedrock_helper.converse(messages=prompt)
+
+        The file is written by a background thread, which merges the updates of instances closed at about the same time
+        and writes each file once. Call flush_config_updates() to wait for the file to be written.
         """
+        if self._closed:
+            return self
+
+        self._closed = True
+
         if not self.auto_update_config:
-            return
+            return self
 
         # Update Bedrock Endpoint Configuration File
         new_config = self.disable_region_in_conf()
 
         if new_config is not None:
-            ## Write the updated region configurations back to the bedrock_endpoints.conf
-            conf_save_result = self.write_json_to_file_with_lock(new_config)
+            ## Queue the updated region configurations to be written back to the bedrock_endpoints.conf
+            _submit_config_update(self.config_file_path, new_config)
+
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __del__(self):
+        """
+        Class Destructor
+
+        The configuration file is not updated during garbage collection. Warn when an instance with
+        auto_update_config is destroyed without calling close().
+        """
+        if getattr(self, 'auto_update_config', False) and not getattr(self, '_closed', True):
+            warnings.warn("BedrockConnectHelper was not closed, so the endpoint configuration file was not updated. "
+                          "Call close() or use the instance as a context manager.", ResourceWarning)
 
 
     def set_debug_mode(self, status=False):
-        """Switch the debug mode on/off."""
+        """
+        Switch the debug mode on/off.
+
+        Bind the debug output function once, so that debug calls in the request path do not check the debug mode.
+        """
         self.debug_mode = status
+        self._log = _logger.debug if status else _no_debug
 
         return self
 
-    def debug(self, message):
-        """Print debug messaging in debug mode."""
-        if self.debug_mode:
-            print(message)
+    def debug(self, message, *args):
+        """Log debug messaging in debug mode. The message is formatted with args in the logging style, only when it is logged."""
+        self._log(message, *args)
+
+    def log_error(self, message, *args, level=logging.ERROR):
+        """
+        Log an error message, and keep it in the latest error messages of the instance
+
+        Args:
+            message (string) -- The message, which is formatted with args in the logging style.
+            level (int) -- The logging level.
+        """
+        _logger.log(level, message, *args)
+        self.error_logs.append(message % args if args else message)
@@ -8,7 +8,19 @@ BedrockConnectUtil: The parent utility class.
 BedrockConnectUtilInvokeModel: A sub-class of BedrockConnectUtil class that provides data-handling methods for Bedrock InvokeModel & InvokeModelWithResponseStream APIs.
 BedrockConnectUtilConverse: A sub-class of BedrockConnectUtil class that provides data-handling methods for Bedrock Converse & ConverseStream APIs.
 """
-import botocore
+import json
+import logging
+import botocore.exceptions
+
+# Parse the streaming chunks with orjson when it is installed
+try:
+    import orjson
+
+    _json_loads = orjson.loads
+except ImportError:
+    _json_loads = json.loads
+
+_logger = logging.getLogger(__name__)
 
 class BedrockConnectUtilFactory:
     """
@@ -28,7 +40,7 @@ class BedrockConnectUtilFactory:
         
         Arguments:
             apiMethod(string) - The API name for choosing the relevant utility class.
-            debugMode(bool) - It controls whether print debug information.
+            debugMode(bool) - It controls whether log debug information.
         
         Returns:
            Object - instance of the sub-class of BedrockConnectUtil
@@ -45,7 +57,7 @@ class BedrockConnectUtil:
     The parent utility class that contains universal methods for all sub-classes
 
     Arguments:
-        debugMode(bool) - It controls whether print debug information.
+        debugMode(bool) - It controls whether log debug information.
     """
 
     def __init__(self, debugMode=False):
@@ -59,10 +71,10 @@ class BedrockConnectUtil:
 
         return self
 
-    def debug(self, message):
-        """Print debug messaging in debug mode."""
+    def debug(self, message, *args):
+        """Log debug messaging in debug mode. The message is formatted with args in the logging style, only when it is logged."""
         if self.debug_mode:
-            print(message)
+            _logger.debug(message, *args)
 
 
     def retrieve_response_streamdata(self, streaming_data, contentOnly=True):
@@ -76,27 +88,23 @@ class BedrockConnectUtil:
         Returns:
             Iterator
         """
-        output = ''
+        # Collect the chunks and join them once, instead of building a new string for each chunk
+        output = []
 
         if streaming_data:
 
-            while True:
-
-                try:
-                    chunk_data = next(streaming_data)
+            try:
+                for chunk_data in streaming_data:
 
                     if contentOnly and 'text' in chunk_data:
-                        output += str(chunk_data['text'])
+                        output.append(str(chunk_data['text']))
                     else:
-                        output += str(chunk_data)
+                        output.append(str(chunk_data))
 
-                except botocore.exceptions.EventStreamError as e:
-                    self.debug(f"Error processing event stream: {e}")
-                    break
-                except StopIteration:
-                    break
+            except botocore.exceptions.EventStreamError as e:
+                self.debug("Error processing event stream: %s", e)
 
-        return output
+        return ''.join(output)
 
 
 class BedrockConnectUtilInvokeModel(BedrockConnectUtil):
@@ -104,7 +112,7 @@ class BedrockConnectUtilInvokeModel(BedrockConnectUtil):
     The utility class that contains methods for Bedrock InvokeModel & InvokeModelWithResponseStream APIs
 
     Arguments:
-        debugMode(bool) - It controls whether print debug information.
+        debugMode(bool) - It controls whether log debug information.
     """
 
     def retrieve_response_stream_chunk(self, stream_data, contentOnly=False):
@@ -118,22 +126,22 @@ class BedrockConnectUtilInvokeModel(BedrockConnectUtil):
         Returns:
             Iterator
         """
-        import json
-
         if stream_data:
             for event in stream_data:
                 
                 chunk = event.get("chunk")
 
                 if chunk:
-                    chunk_obj = json.loads(chunk.get("bytes").decode())
-                    self.debug(f"STREAMING INFO: {chunk_obj}\n")
+                    chunk_obj = _json_loads(chunk.get("bytes")) # Both json.loads() and orjson.loads() decode UTF-8 bytes themselves
+
+                    # Check the debug mode before the call, as it runs for every chunk
+                    if self.debug_mode:
+                        self.debug("STREAMING INFO: %s\n", chunk_obj)
 
                     if contentOnly:
-                        if 'delta' in chunk_obj and 'text' in chunk_obj['delta']:
-                            text = chunk_obj['delta']
-                        else:
-                            self.debug(f"STREAMING INFO: {chunk_obj}\n")
+                        text = chunk_obj.get('delta')
+
+                        if not text or 'text' not in text:
                             continue
                     else:
                         text = chunk_obj
@@ -146,7 +154,7 @@ class BedrockConnectUtilConverse(BedrockConnectUtil):
     The utility class that contains methods for Bedrock Converse & ConverseStream APIs
 
     Arguments:
-        debugMode(bool) - It controls whether print debug information.
+        debugMode(bool) - It controls whether log debug information.
     """
 
     def retrieve_response_stream_chunk(self, stream_data, contentOnly=False):
@@ -163,12 +171,16 @@ class BedrockConnectUtilConverse(BedrockConnectUtil):
         if stream_data:
 
             for event in stream_data:
-                self.debug(f"STREAMING INFO: {event}\n")
+                # Check the debug mode before the call, as it runs for every chunk
+                if self.debug_mode:
+                    self.debug("STREAMING INFO: %s\n", event)
                 
                 if contentOnly:
-                    if 'contentBlockDelta' in event and 'delta' in event['contentBlockDelta']:
-                        text = event['contentBlockDelta']['delta']
-                    else:
+                    # Look up each key once, as it runs for every chunk
+                    content_block_delta = event.get('contentBlockDelta')
+                    text = content_block_delta.get('delta') if content_block_delta else None
+
+                    if text is None:
                         continue
                 else:
                     text = event
@@ -4,6 +4,7 @@ An example of the calling Bedrock Converse API using BedrockConnectHelper
 Modify the value of "debug_mode" parameter to switch on/off debug information,
 when initialize the BedrockConnectHelper class instance.
 """
+import logging
 from bedrock_connect_helper.bedrock_connect_helper import BedrockConnectHelper
 
 # Set the file path to the Bedrock endpoint configuration file
@@ -11,6 +12,13 @@ filename = 'bedrock_connect_helper/bedrock_endpoints.conf'
 
 model_id = "anthropic.claude-3-haiku-20240307-v1:0"
 
+debug_mode = False
+
+if debug_mode:
+    # BedrockConnectHelper logs debug information to the "bedrock_connect_helper" logger
+    logging.basicConfig(format='%(message)s')
+    logging.getLogger('bedrock_connect_helper').setLevel(logging.DEBUG)
+
 # Construct a Bedrock InvokeModel API request
 system_prompt = []
 
@@ -25,7 +33,7 @@ prompt = [
     }
 ]
 
-bedrock_helper = BedrockConnectHelper(model_id=model_id, auto_load_config=True, config_file_path=filename, debug_mode=False)
+bedrock_helper = BedrockConnectHelper(model_id=model_id, auto_load_config=True, config_file_path=filename, debug_mode=debug_mode)
 
 # Uncomment the line below to enable Amazon Bedrock Cross-region inference feature. Please note till 2024-09-14, it only supports some of Anthropic's Claude models.
 # bedrock_helper.set_cross_region_inference(True)